@@ -41,10 +41,21 @@ def insert_sql(daily_consumption,date):
                 )
             END
             ''') # create table
-    
+
+            cursor.execute('''
+            IF
+            ( NOT EXISTS
+            (select 1 from sys.indexes where name = 'IX_elecDaily_Date' and object_id = OBJECT_ID(N'[elecDaily]'))
+            )
+            BEGIN
+                CREATE UNIQUE NONCLUSTERED INDEX IX_elecDaily_Date ON elecDaily (Date) INCLUDE (Esum)
+            END
+            ''') # index on the date so lookups by day are seeks, unique since there is one row per day
+
             cursor.execute('''
-            INSERT INTO elecDaily (Esum,Data)
-            VALUES (?,?)''',(daily_consumption,date)) #insert into table
+            INSERT INTO elecDaily (Esum,Date)
+            SELECT ?,?
+            WHERE NOT EXISTS (select 1 from elecDaily where Date = ?)''',(daily_consumption,date,date)) #insert into table, skipped if the day is already there
     
             # cursor.execute('SELECT * FROM elec_daily')
             # rows = cursor.fetchall()
@@ -73,8 +84,8 @@ def main():
 
     url_daily="http://10.247.40.36/feed/data.json?id=21&start="+str(timestamp_milliseconds_previous_day)+"&end="+str(timestamp_milliseconds)+"&mode=daily&apikey=APIKEY" #details about how url is formed can be found here https://emoncms.org/site/api#feed , add your own APIKEY
 
-    response_daily=urlopen(url_daily)
-    data_json_daily=json.loads(response_daily.read())
+    with urlopen(url_daily) as response_daily: #closes the socket as soon as the body has been parsed
+        data_json_daily=json.load(response_daily)
     e_sum_previous_day=data_json_daily[0][1]
     e_sum_midnight=data_json_daily[1][1]  #extracting data from json
     daily_consumption=e_sum_midnight-e_sum_previous_day
@@ -1,9 +1,9 @@
-from urllib.request import urlopen
-import json
+import requests as req
 import pyodbc
 import time
 import datetime 
 url="http://10.247.40.36/feed/fetch.json?ids=20,21&apikey=APIKEY" #details about how url is formed can be found here https://emoncms.org/site/api#feed ,add your own APIKEY
+session = req.Session() #keeps the TCP connection to emoncms alive between requests
 
 #Connection information
 # Your SQL Server instance
@@ -23,26 +23,36 @@ f"Trusted_Connection={trusted_connection};"
 f"Encrypt={encryption_pref}"
 )
 
+connection = None #kept open between inserts, reset to None after an error so the next insert reconnects
+cursor = None
+
+def connect_sql():
+    global connection, cursor
+    # Create a connection
+    connection = pyodbc.connect(connection_string)
+    cursor = connection.cursor()
+    cursor.execute('''
+    IF 
+    ( NOT EXISTS 
+    (select object_id from sys.objects where object_id = OBJECT_ID(N'[emoncms]') and type = 'U')
+    )
+    BEGIN
+        CREATE TABLE emoncms 
+        (
+            id INT NOT NULL IDENTITY(1,1) PRIMARY KEY,
+            Psum REAL,
+            Esum REAL,
+            Timestamp DATETIME
+        )
+    END
+    ''') # create table, only needed once per connection
+    connection.commit()
+
 def insert_sql(esum, psum,timestamp):
+    global connection, cursor
     try:
-        # Create a connection
-        connection = pyodbc.connect(connection_string)
-        cursor = connection.cursor()
-        cursor.execute('''
-        IF 
-        ( NOT EXISTS 
-        (select object_id from sys.objects where object_id = OBJECT_ID(N'[emoncms]') and type = 'U')
-        )
-        BEGIN
-            CREATE TABLE emoncms 
-            (
-                id INT NOT NULL IDENTITY(1,1) PRIMARY KEY,
-                Psum REAL,
-                Esum REAL,
-                Timestamp DATETIME
-            )
-        END
-        ''') # create table
+        if connection is None:
+            connect_sql()
    
         cursor.execute('''
         INSERT INTO emoncms (Psum,Esum,Timestamp)
@@ -55,29 +65,46 @@ def insert_sql(esum, psum,timestamp):
         #for row in rows:
         #    print(row) # print table, used for debugging, can be removed
         connection.commit()
-        connection.close()
      
     except pyodbc.Error as ex:
         print("An error occurred in SQL Server:", ex)
+        if connection is not None:
+            try:
+                connection.close()
+            except pyodbc.Error:
+                pass
+        connection = None #reconnect on the next insert
+        cursor = None
+
+midnight_day = None #date the cached e_sum_midnight belongs to
+interval = 60 #repeat every minute, can be changed
+start_time = time.monotonic() #ticks are scheduled on a fixed grid from here, so the time spent fetching/inserting doesn't add up as drift
+tick = 0
 
 while True:
-    midnight = datetime.datetime.combine(datetime.date.today(), datetime.time.min)
-    timestamp_seconds = int(midnight.timestamp())
-    timestamp_milliseconds = timestamp_seconds * 1000 #finding UNIX_MILLISECOND timestamp at midnight
+    today = datetime.date.today()
+    if today != midnight_day: #the midnight value only changes once a day, so only fetch it when the date rolls over
+        midnight = datetime.datetime.combine(today, datetime.time.min)
+        timestamp_seconds = int(midnight.timestamp())
+        timestamp_milliseconds = timestamp_seconds * 1000 #finding UNIX_MILLISECOND timestamp at midnight
  
-    current_timestamp_milliseconds = round(time.time()*1000) #finding current UNIX_MILLISECOND timestamp
+        current_timestamp_milliseconds = round(time.time()*1000) #finding current UNIX_MILLISECOND timestamp
  
-    url_midnight="http://10.247.40.36/feed/data.json?id=21&start="+str(timestamp_milliseconds)+"&end="+str(current_timestamp_milliseconds)+"&mode=daily&apikey=APIKEY"  #details about how url is formed can be found here https://emoncms.org/site/api#feed , add your own APIKEY
+        url_midnight="http://10.247.40.36/feed/data.json?id=21&start="+str(timestamp_milliseconds)+"&end="+str(current_timestamp_milliseconds)+"&mode=daily&apikey=APIKEY"  #details about how url is formed can be found here https://emoncms.org/site/api#feed , add your own APIKEY
 
-    response_midnight=urlopen(url_midnight)
-    data_json_midnight=json.loads(response_midnight.read())
-    e_sum_midnight=data_json_midnight[0][1] #extracting elec_sum at midnight
+        data_json_midnight=session.get(url_midnight,timeout=30).json()
+        e_sum_midnight=data_json_midnight[0][1] #extracting elec_sum at midnight
+        midnight_day = today
 
-    response=urlopen(url)
-    data_json=json.loads(response.read())
+    data_json=session.get(url,timeout=30).json()
     p_sum=data_json[0] #extracting current p_sum
     e_sum=data_json[1]-e_sum_midnight #current daily sum= current e_sum- e_sum at midnight
     timestamp=datetime.datetime.now() #finding current time to insert into table
     insert_sql(e_sum,p_sum,timestamp) #inserting new values into table
     print(e_sum,p_sum,timestamp) #for debugging purposes, can be removed
-    time.sleep(60) #repeat every minute, can be changed
\ No newline at end of file
+    tick += 1
+    sleep_for = start_time + tick*interval - time.monotonic()
+    if sleep_for > 0:
+        time.sleep(sleep_for)
+    else:
+        tick = int((time.monotonic() - start_time) / interval) #fell behind (e.g. a slow request), rejoin the grid instead of running a burst of catch-up ticks
\ No newline at end of file
@@ -1,5 +1,6 @@
 import pandas as pd
 import pyodbc
+from constants import waste_rows
 
 #Connection information
 # Your SQL Server instance
@@ -19,25 +20,7 @@ f"Trusted_Connection={trusted_connection};"
 f"Encrypt={encryption_pref}"
 )
  
-to_litre={'µl':0.000001,
-          'µL':0.000001,
-          'ul':0.000001,
-          'uL':0.000001,
-          'ml':0.001,
-          'mL':0.001,
-          'l':1.0,
-          'L':1.0,
-          'µg':0.00000000125,
-          'ug':0.00000000125,
-          'mg':0.00000125,
-          'g':0.00125,
-          'kg':1.25,
-          'oz':0.035436875,
-          'lb':0.56699,
-          'lbs':0.56699,
-          'gal':4.54609}
- 
-def insert_sql(hp,volume,datestamp):
+def insert_sql(rows):
     try:
         # Create a connection
         connection = pyodbc.connect(connection_string)
@@ -58,9 +41,10 @@ def insert_sql(hp,volume,datestamp):
         END
         ''') # create table
 
-        cursor.execute('''
+        cursor.fast_executemany = True #send all the (HP,Volume,Datestamp) rows in one round trip
+        cursor.executemany('''
         INSERT INTO chemWaste (HP,Volume,Datestamp)
-        VALUES (?,?,?)''',(hp,volume,datestamp)) #insert into table
+        VALUES (?,?,?)''',rows) #insert into table
 
         # cursor.execute('SELECT * FROM chemOrders')
         # rows = cursor.fetchall()
@@ -75,18 +59,11 @@ def insert_sql(hp,volume,datestamp):
     except pyodbc.Error as ex:
         print("An error occurred in SQL Server:", ex)
 
-df = pd.read_excel("Waste Master.xlsx") #file you need to read from, make sure it's in the same folder as this python script
+df = pd.read_excel("Waste Master.xlsx", usecols=lambda column: column in ('Unnamed: 0', 'Unnamed: 3', 'Unnamed: 4') or column.startswith('HP')) #file you need to read from, make sure it's in the same folder as this python script. Only the date, quantity, unit and HP columns are loaded
 
 df['Unnamed: 0'] = pd.to_datetime(df['Unnamed: 0']).dt.date
-date_set=df['Unnamed: 0'].unique()
 results = []
- 
-for date in date_set:
-    sub_df=df[df['Unnamed: 0'] == date]
-    #print(f"Sub DataFrame for date {date}:")
-    #print(sub_df)
-    for column in sub_df.columns:
-        if column.startswith('HP') and sub_df[column].dtype in ['int64', 'float64']:
-            column_sum = (sub_df[column] * sub_df["Unnamed: 3"] * sub_df['Unnamed: 4'].map(to_litre)).sum()
-            insert_sql(column,column_sum,date)
-            print(f"Sum of column '{column}' for date {date}: {column_sum}")
\ No newline at end of file
+
+rows = waste_rows(df)
+if rows:
+    insert_sql(rows)
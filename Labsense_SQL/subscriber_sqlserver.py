@@ -1,9 +1,23 @@
 import paho.mqtt.client as mqtt #import library
+import ast
+import datetime
 import json
+import logging
+import queue
+import signal
+import threading
+import time
 import pyodbc
 
 MQTT_SERVER = "10.253.179.46" #specify the broker address, in this case the IP address of the computer
 TOPICS = ["water", "fumehood"] #this is the name of topic, like water
+SHARED_GROUP = None #set to a name, e.g. "labsense", to run several copies of this script that share the messages between them (needs an MQTT v5 broker)
+BATCH_SIZE = 100 #rows collected by the writer before they are written in one go
+FLUSH_INTERVAL = 0.5 #seconds a buffered row can wait before it is written anyway
+SHUTDOWN_TIMEOUT = 30 #seconds allowed on exit for the writer to take the queued rows, so a stuck writer can't hang shutdown
+MAX_PAYLOAD_BYTES = 4096 #readings are a few hundred bytes, anything much bigger is not one of ours
+
+logger = logging.getLogger(__name__)
 
 #Connection information
 # Your SQL Server instance
@@ -23,34 +37,111 @@ f"Trusted_Connection={trusted_connection};"
 f"Encrypt={encryption_pref}"
 )
 
-def insert_sql_water(labId, sublabId, water, timestamp):
-    if water is None:
-        water = 0.0 #ensures water isn't null before inserting into table
-    try:
-        # Create a connection
-        connection = pyodbc.connect(connection_string)
-        cursor = connection.cursor()
-        cursor.execute('''
-        IF 
-        ( NOT EXISTS 
-        (select object_id from sys.objects where object_id = OBJECT_ID(N'[water]') and type = 'U')
+connection = None #opened on the first message and kept for the following ones, reset to None after an error so the next message reconnects
+water_cursor = None #one cursor per INSERT statement, so each keeps its statement prepared between messages
+fumehood_cursor = None
+
+def init_database():
+    global connection, water_cursor, fumehood_cursor
+    # Create a connection
+    connection = pyodbc.connect(connection_string)
+    cursor = connection.cursor()
+    cursor.execute('''
+    IF 
+    ( NOT EXISTS 
+    (select object_id from sys.objects where object_id = OBJECT_ID(N'[water]') and type = 'U')
+    )
+    BEGIN
+        CREATE TABLE water
+        (
+            id INT NOT NULL IDENTITY(1,1) PRIMARY KEY,
+            LabId SMALLINT,
+            SublabId SMALLINT,           
+            Water REAL,
+            Timestamp DATETIME2(0)
         )
-        BEGIN
-            CREATE TABLE water
-            (
-                id INT NOT NULL IDENTITY(1,1) PRIMARY KEY,
-                LabId INTEGER,
-                SublabId INTEGER,           
-                Water REAL,
-                Timestamp DATETIME
-            )
-        END
-        ''') # create table
-
-        cursor.execute('''
-        INSERT INTO water (LabId,SublabId, Water, Timestamp)
-        VALUES (?,?,?,?)''',(labId, sublabId, water,timestamp)) #insert into water table
-        
+    END
+    ''') # create table, lab ids are small numbers and readings are timestamped to the second so the compact types are enough
+
+    cursor.execute('''
+    IF 
+    ( NOT EXISTS 
+    (select object_id from sys.objects where object_id = OBJECT_ID(N'[fumehood]') and type = 'U')
+    )
+    BEGIN
+        CREATE TABLE fumehood
+        (
+            id INT NOT NULL IDENTITY(1,1) PRIMARY KEY,
+            LabId SMALLINT,
+            SublabId SMALLINT,           
+            Distance REAL,
+            Light REAL,
+            Airflow REAL,
+            Timestamp DATETIME2(0)
+        )
+    END
+    ''') # create table
+    connection.commit()
+    cursor.close()
+
+    water_cursor = connection.cursor()
+    fumehood_cursor = connection.cursor()
+
+def close_database():
+    global connection, water_cursor, fumehood_cursor
+    if connection is not None:
+        try:
+            connection.close()
+        except pyodbc.Error:
+            pass #connection was already broken
+    connection = None
+    water_cursor = None
+    fumehood_cursor = None
+
+db_queue = queue.Queue(maxsize=10000) #rows handed from the MQTT thread to the database writer thread
+STOP = None #put on the queue to make the writer write what it has and exit
+
+water_insert = '''
+INSERT INTO water (LabId,SublabId, Water, Timestamp)
+VALUES (?,?,?,?)''' #insert into water table
+fumehood_insert = '''
+INSERT INTO fumehood (LabId,SublabId, Distance, Light, Airflow, Timestamp)
+VALUES (?,?,?,?,?,?)''' #insert into fumehood table
+
+def is_connection_error(ex):
+    #a lost link or timeout comes up as OperationalError/InterfaceError or with an 08xxx SQLSTATE, anything else is a problem with the rows
+    return isinstance(ex, (pyodbc.OperationalError, pyodbc.InterfaceError)) or str(ex.args[0] if ex.args else '').startswith('08')
+
+def write_rows_singly(sql, rows):
+    #used after a batch fails, so only the row that caused the error is lost rather than the whole batch
+    cursor = connection.cursor()
+    for i, row in enumerate(rows):
+        try:
+            cursor.execute(sql, row)
+            connection.commit()
+        except pyodbc.Error as ex:
+            if is_connection_error(ex):
+                logger.error("Lost the SQL Server connection, %d rows dropped: %s", len(rows) - i, ex)
+                close_database()
+                return
+            logger.error("An error occurred in SQL Server, row %r dropped: %s", row, ex)
+            connection.rollback()
+
+def write_rows(water_rows, fumehood_rows):
+    if not water_rows and not fumehood_rows:
+        return
+    try:
+        if connection is None:
+            init_database()
+
+        if water_rows:
+            water_cursor.fast_executemany = True #send the whole batch in one round trip
+            water_cursor.executemany(water_insert, water_rows)
+
+        if fumehood_rows:
+            fumehood_cursor.fast_executemany = True
+            fumehood_cursor.executemany(fumehood_insert, fumehood_rows)
+
         #cursor.execute('SELECT * FROM water')
         #rows = cursor.fetchall()
         
@@ -60,10 +151,62 @@ def insert_sql_water(labId, sublabId, water, timestamp):
         #for row in rows:
         #    print(row) #view table
         connection.commit()
-        connection.close()
      
     except pyodbc.Error as ex:
-        print("An error occurred in SQL Server:", ex)
+        if connection is None or is_connection_error(ex):
+            logger.error("An error occurred in SQL Server, %d rows dropped: %s", len(water_rows) + len(fumehood_rows), ex)
+            close_database() #the next batch starts on a fresh connection
+            return
+        logger.error("An error occurred in SQL Server, retrying the batch row by row: %s", ex)
+        try:
+            connection.rollback()
+            write_rows_singly(water_insert, water_rows)
+            if connection is not None:
+                write_rows_singly(fumehood_insert, fumehood_rows)
+        except pyodbc.Error as ex:
+            logger.error("An error occurred in SQL Server: %s", ex)
+            close_database()
+
+def db_writer():
+    #only this thread touches the connection, so on_message never waits on SQL Server
+    running = True
+    while running:
+        water_rows = []
+        fumehood_rows = []
+        item = db_queue.get() #wait for the first row of the next batch
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while item is not STOP:
+            table, row = item
+            if table == "water":
+                water_rows.append(row)
+            else:
+                fumehood_rows.append(row)
+            remaining = deadline - time.monotonic()
+            if len(water_rows) + len(fumehood_rows) >= BATCH_SIZE or remaining <= 0:
+                break
+            try:
+                item = db_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        if item is STOP:
+            running = False
+        try:
+            write_rows(water_rows, fumehood_rows)
+        except Exception: #anything write_rows doesn't handle must not end the only writer, or the queue fills and on_message stalls
+            logger.exception("Unexpected error writing to SQL Server, %d rows dropped", len(water_rows) + len(fumehood_rows))
+            close_database()
+    close_database()
+
+def queue_row(table, row):
+    try:
+        db_queue.put_nowait((table, row)) #never blocks the MQTT thread
+    except queue.Full:
+        logger.warning("Database writer is %d rows behind, %s reading dropped", db_queue.maxsize, table)
+
+def insert_sql_water(labId, sublabId, water, timestamp):
+    if water is None:
+        water = 0.0 #ensures water isn't null before inserting into table
+    queue_row("water", (labId, sublabId, water, timestamp))
 
 def insert_sql_fumehood(labId,sublabId,distance,light,airflow,timestamp):
     if distance is None: #ensures distance isn't null before inserting into table
@@ -72,87 +215,97 @@ def insert_sql_fumehood(labId,sublabId,distance,light,airflow,timestamp):
         light=0.0
     if airflow is None: #ensures airflow isn't null before inserting into table
         airflow=0.0
-
-    try:
-        # Create a connection
-        connection = pyodbc.connect(connection_string)
-        cursor = connection.cursor()
-        cursor.execute('''
-        IF 
-        ( NOT EXISTS 
-        (select object_id from sys.objects where object_id = OBJECT_ID(N'[fumehood]') and type = 'U')
-        )
-        BEGIN
-            CREATE TABLE fumehood
-            (
-                id INT NOT NULL IDENTITY(1,1) PRIMARY KEY,
-                LabId INTEGER,
-                SublabId INTEGER,           
-                Distance REAL,
-                Light REAL,
-                Airflow REAL,
-                Timestamp DATETIME
-            )
-        END
-        ''') # create table
-
-        cursor.execute('''
-        INSERT INTO fumehood (LabId,SublabId, Distance, Light, Airflow, Timestamp)
-        VALUES (?,?,?,?,?,?)''',(labId, sublabId, distance,light,airflow,timestamp))
-        
-        #cursor.execute('SELECT * FROM fumehood')
-        #rows = cursor.fetchall()
-        #column_names = [description[0] for description in cursor.description]
-        #print(f"{column_names}")
-        # Print each row
-        #for row in rows:
-        #    print(row)
-        connection.commit()
-        connection.close()
-     
-    except pyodbc.Error as ex:
-        print("An error occurred in SQL Server:", ex)
+    queue_row("fumehood", (labId, sublabId, distance, light, airflow, timestamp))
  
 # The callback for when the client receives a CONNACK response from the server.
-def on_connect(client, userdata, flags, rc):
-    print("Connected with result code "+str(rc))
+def on_connect(client, userdata, flags, rc, properties=None):
+    logger.info("Connected with result code %s", rc)
  
     # Subscribing in on_connect() means that if we lose the connection and
     # reconnect then subscriptions will be renewed.
     for topic in TOPICS:    
+        if SHARED_GROUP:
+            topic = f"$share/{SHARED_GROUP}/{topic}" #the broker hands each message to only one member of the group
         client.subscribe(topic)
  
+def handle_water(labId, sublabId, sensorReadings, timestamp):
+    if not isinstance(sensorReadings, dict) or "water" not in sensorReadings: #the topic alone doesn't guarantee the reading is there
+        logger.warning("Ignoring water message without a water reading: %r", sensorReadings)
+        return
+    water = sensorReadings.get('water') 
+    water_litres=float(water)/1000
+    logger.debug("water in ml: %s, in litres: %s", water, water_litres)
+    insert_sql_water(labId, sublabId, water_litres, timestamp) #inserts data we just extracted into the table
+
+def handle_fumehood(labId, sublabId, sensorReadings, timestamp):
+    temp=sensorReadings.get('fumehood') if isinstance(sensorReadings, dict) else None
+    if not isinstance(temp, dict): #the topic alone doesn't guarantee the readings are there
+        logger.warning("Ignoring fumehood message without fumehood readings: %r", sensorReadings)
+        return
+    distance=temp.get('distance') #missing values are stored as 0.0 by insert_sql_fumehood
+    light=temp.get('light')
+    airflow=temp.get('airflow')
+    logger.debug("distance: %s, light: %s, airflow: %s", distance, light, airflow)
+    insert_sql_fumehood(labId,sublabId,distance,light,airflow,timestamp)#inserts data we just extracted into the table
+
+handlers = {"water": handle_water, "fumehood": handle_fumehood} #the sensors publish each reading type on the topic of the same name
+
 def on_message(client, userdata, msg): 
+    handler = handlers.get(msg.topic) #checks where the message is coming from
+    if handler is None:
+        logger.warning("Ignoring message on unknown topic %s", msg.topic)
+        return
+    if len(msg.payload) < 2 or msg.payload[:1] != b'{': #empty, retained-clear or non-dict payloads are dropped before any parsing
+        logger.warning("Ignoring payload on %s that is not a dict", msg.topic)
+        return
+    if len(msg.payload) > MAX_PAYLOAD_BYTES:
+        logger.warning("Ignoring %d byte payload on %s", len(msg.payload), msg.topic)
+        return
     try: 
-        print(msg.payload.decode('utf-8') ) #view the message being sent, used for debugging and can be removed
-        message = msg.payload.decode('utf-8') 
-        message=message.replace("'",'"') #modify the message so that it can be converted to a json dictionary-equivalent
-        data = json.loads(message) 
+        logger.debug("Received on %s: %s", msg.topic, msg.payload) #view the message being sent, only formatted when debugging is on
+        try:
+            data = json.loads(msg.payload) #publishers sending real JSON
+        except json.JSONDecodeError:
+            data = ast.literal_eval(msg.payload.decode('utf-8')) #the Pico/Pi publishers send str(dict) with single quotes, parsed as-is so apostrophes in values survive
         labId=data.get('labId')
         sublabId=data.get('sublabId')
         timestamp=data.get('measureTimestamp')
+        try:
+            timestamp=datetime.datetime.fromisoformat(timestamp) #bound as a DATETIME rather than a string SQL Server has to parse
+        except (TypeError, ValueError):
+            logger.warning("Ignoring message on %s with unreadable timestamp %r", msg.topic, timestamp)
+            return #a string that SQL Server can't convert would fail the whole batch it is written in
         sensorReadings=data.get('sensorReadings') #extract necessary data from the message
-        if "water" in sensorReadings: #checks where the message is coming from
-            water = sensorReadings.get('water') 
-            print("water in ml:",water)#for degugging, can be removed
-            water_litres=float(water)/1000
-            print("water in litres:",water_litres)
-            insert_sql_water(labId, sublabId, water_litres, timestamp) #inserts data we just extracted into the table
-
-        if "fumehood" in sensorReadings: #checks where the message is coming from
-            temp=sensorReadings['fumehood']
-            distance=temp['distance']
-            light=temp['light']
-            airflow=temp['airflow']
-            print(distance,light,airflow)
-            insert_sql_fumehood(labId,sublabId,distance,light,airflow,timestamp)#inserts data we just extracted into the table
-
-    except json.JSONDecodeError as e: 
-        print(f"Failed to decode JSON message: {e}")
+        handler(labId, sublabId, sensorReadings, timestamp)
+
+    except (ValueError, SyntaxError, KeyError, TypeError, AttributeError) as e: #a bad message is skipped, an exception here would stop loop_forever
+        logger.warning("Ignoring malformed message %r: %s", msg.payload, e)
  
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-client.connect(MQTT_SERVER,1883,60) #connects to the mqtt server, on port 1883 and timeout of 60s
-client.loop_forever()# use this line if you don't want to write any further code. It blocks the code forever to check for data
-#client.loop_start()  #use this line if you want to write any more 
\ No newline at end of file
+def main():
+    logging.basicConfig(level=logging.INFO) #set to logging.DEBUG to see every message and reading, used for debugging. Only done when run as a script, so importing this module leaves logging alone
+    if SHARED_GROUP:
+        client = mqtt.Client(protocol=mqtt.MQTTv5) #shared subscriptions are an MQTT v5 feature
+    else:
+        client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(MQTT_SERVER,1883,60) #connects to the mqtt server, on port 1883 and timeout of 60s
+
+    def handle_sigterm(signum, frame):
+        client.disconnect() #makes loop_forever return, so the rows still queued are written before exiting
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    writer = threading.Thread(target=db_writer, daemon=True)
+    writer.start()
+    try:
+        client.loop_forever()# use this line if you don't want to write any further code. It blocks the code forever to check for data
+        #client.loop_start()  #use this line if you want to write any more
+    finally:
+        try:
+            db_queue.put(STOP, timeout=SHUTDOWN_TIMEOUT) #let the writer drain the queue before exiting
+            writer.join(SHUTDOWN_TIMEOUT)
+        except queue.Full:
+            logger.warning("Database writer is not keeping up, exiting with %d rows unwritten", db_queue.qsize())
+
+if __name__ == "__main__":
+    main()
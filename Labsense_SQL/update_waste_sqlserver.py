@@ -1,6 +1,7 @@
 import pandas as pd
 from datetime import datetime, timedelta, date
 import pyodbc
+from constants import waste_rows
 
 #Connection information
 # Your SQL Server instance
@@ -20,81 +21,65 @@ f"Trusted_Connection={trusted_connection};"
 f"Encrypt={encryption_pref}"
 )
 
-to_litre={'µl':0.000001,
-          'µL':0.000001,
-          'ul':0.000001,
-          'uL':0.000001,
-          'ml':0.001,
-          'mL':0.001,
-          'l':1.0,
-          'L':1.0,
-          'µg':0.00000000125,
-          'ug':0.00000000125,
-          'mg':0.00000125,
-          'g':0.00125,
-          'kg':1.25,
-          'oz':0.035436875,
-          'lb':0.56699,
-          'lbs':0.56699,
-          'gal':4.54609}
-
-def insert_sql(hp,volume,datestamp):
-    try:
-        # Create a connection
-        connection = pyodbc.connect(connection_string)
-        cursor = connection.cursor()
-        cursor.execute('''
-        IF 
-        ( NOT EXISTS 
-        (select object_id from sys.objects where object_id = OBJECT_ID(N'[chemWaste]') and type = 'U')
+def ensure_schema(cursor):
+    cursor.execute('''
+    IF 
+    ( NOT EXISTS 
+    (select object_id from sys.objects where object_id = OBJECT_ID(N'[chemWaste]') and type = 'U')
+    )
+    BEGIN
+        CREATE TABLE chemWaste
+        (
+            id INT NOT NULL IDENTITY(1,1) PRIMARY KEY,
+            HP VARCHAR(4),
+            Volume REAL,
+            Datestamp DATE
         )
-        BEGIN
-            CREATE TABLE chemWaste
-            (
-                id INT NOT NULL IDENTITY(1,1) PRIMARY KEY,
-                HP VARCHAR(4),
-                Volume REAL,
-                Datestamp DATE
-            )
-        END
-        ''') # create table
+    END
+    ''') # create table
+
+def insert_sql(cursor, rows):
+    cursor.fast_executemany = True #send all the (HP,Volume,Datestamp) rows in one round trip
+    cursor.executemany('''
+    INSERT INTO chemWaste (HP,Volume,Datestamp)
+    VALUES (?,?,?)''',rows) #insert into table
+
+    # cursor.execute('SELECT * FROM chemOrders')
+    # rows = cursor.fetchall()
+    
+    # column_names = [description[0] for description in cursor.description]
+    # print(f"{column_names}")
+    # for row in rows:
+    #    print(row)  #printing table, for debugging purposes
 
-        cursor.execute('''
-        INSERT INTO chemWaste (HP,Volume,Datestamp)
-        VALUES (?,?,?)''',(hp,volume,datestamp)) #insert into table
+def main():
+    df = pd.read_excel("Waste Master.xlsx", usecols=lambda column: column in ('Unnamed: 0', 'Unnamed: 3', 'Unnamed: 4') or column.startswith('HP')) #add path to the file you need to read from. Only the date, quantity, unit and HP columns are loaded
 
-        # cursor.execute('SELECT * FROM chemOrders')
-        # rows = cursor.fetchall()
-        
-        # column_names = [description[0] for description in cursor.description]
-        # print(f"{column_names}")
-        # for row in rows:
-        #    print(row)  #printing table, for debugging purposes
-        connection.commit()
-        connection.close()
+    df['Unnamed: 0'] = pd.to_datetime(df['Unnamed: 0'], errors='coerce',dayfirst=True)
+    df = df.dropna(subset=['Unnamed: 0'])
+    date_30_days_ago = datetime.now() - timedelta(days=30)
+    current_date=datetime.now()
+    df_filtered = df[(df['Unnamed: 0'] >= date_30_days_ago)] #selects more recent data(at most 30 days ago)
 
-    except pyodbc.Error as ex:
-        print("An error occurred in SQL Server:", ex)
+    #df_filtered['Unnamed: 0'] = pd.to_datetime(df_filtered['Unnamed: 0']).dt.date
+    date_set=df_filtered['Unnamed: 0'].unique()
+    print(date_set)
+    results = []
 
-df = pd.read_excel("Waste Master.xlsx") #add path to the file you need to read from
+    rows = waste_rows(df_filtered)
 
-df['Unnamed: 0'] = pd.to_datetime(df['Unnamed: 0'], errors='coerce',dayfirst=True)
-df = df.dropna(subset=['Unnamed: 0'])
-date_30_days_ago = datetime.now() - timedelta(days=30)
-current_date=datetime.now()
-df_filtered = df[(df['Unnamed: 0'] >= date_30_days_ago)] #selects more recent data(at most 30 days ago)
+    if rows: #one connection for the whole run instead of one per (date, HP) pair
+        try:
+            # Create a connection
+            connection = pyodbc.connect(connection_string)
+            cursor = connection.cursor()
+            ensure_schema(cursor) #the table is checked once per run, not with every insert
+            insert_sql(cursor, rows)
+            connection.commit()
+            connection.close()
 
-#df_filtered['Unnamed: 0'] = pd.to_datetime(df_filtered['Unnamed: 0']).dt.date
-date_set=df_filtered['Unnamed: 0'].unique()
-print(date_set)
-results = []
+        except pyodbc.Error as ex:
+            print("An error occurred in SQL Server:", ex)
 
-for date in date_set:
-    sub_df=df[df['Unnamed: 0'] == date]
-    #print(f"Sub DataFrame for date {date}:")
-    #print(sub_df)
-    for column in sub_df.columns:
-        if column.startswith('HP') and sub_df[column].dtype in ['int64', 'float64']:
-            column_sum = (sub_df[column] * sub_df["Unnamed: 3"] * sub_df['Unnamed: 4'].map(to_litre)).sum()
-            insert_sql(column,column_sum,date)
-            print(f"Sum of column '{column}' for date {date}: {column_sum}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -47,8 +47,8 @@ def main():
 
     url_daily="http://10.247.40.36/feed/data.json?id=21&start="+str(timestamp_milliseconds_previous_day)+"&end="+str(timestamp_milliseconds)+"&mode=daily&apikey=APIKEY" #details about how url is formed can be found here https://emoncms.org/site/api#feed , add your own APIKEY
 
-    response_daily=urlopen(url_daily)
-    data_json_daily=json.loads(response_daily.read())
+    with urlopen(url_daily) as response_daily: #closes the socket as soon as the body has been parsed
+        data_json_daily=json.load(response_daily)
     e_sum_previous_day=data_json_daily[0][1]
     e_sum_midnight=data_json_daily[1][1]  #extracting data from json
     daily_consumption=e_sum_midnight-e_sum_previous_day
@@ -1,42 +1,113 @@
 import paho.mqtt.client as mqtt #import library
 import json
 import sqlite3
+import atexit
+import signal
+import threading
 
 MQTT_SERVER = "10.253.179.46" #specify the broker address, in this case the IP address of the computer
 TOPICS = ["water", "fumehood"] #this is the name of topic, like water
+BATCH_SIZE = 64 #rows held before they are written in one go
+FLUSH_INTERVAL = 1.0 #seconds a held row can wait before it is written anyway
+
+conn = sqlite3.connect('labsense.db',timeout=10,check_same_thread=False) #creates connection to database once, it is reused for every message. Also used by the flush timer, always under db_lock
+conn.execute('PRAGMA journal_mode=WAL;')
+conn.execute('PRAGMA synchronous=NORMAL;') #with WAL this only syncs at checkpoints instead of on every commit, and the database still can't be corrupted
+conn.execute('''
+CREATE TABLE IF NOT EXISTS water (
+    id INTEGER PRIMARY KEY,
+    LabId INTEGER NOT NULL,
+    SublabId INTEGER NOT NULL,           
+    Water REAL NOT NULL ,
+    Timestamp DATETIME NOT NULL
+)
+''') #creates table
+conn.execute('''
+CREATE TABLE IF NOT EXISTS fumehood (
+    id INTEGER PRIMARY KEY,
+    LabId INTEGER NOT NULL,
+    SublabId INTEGER NOT NULL,           
+    Distance REAL NOT NULL ,
+    Light REAL NOT NULL ,
+    Airflow REAL NOT NULL,
+    Timestamp DATETIME NOT NULL
+)
+''')
+atexit.register(conn.close) #close the connection when the script exits
+
+water_batch = [] #rows waiting to be written to the water table
+fumehood_batch = [] #rows waiting to be written to the fumehood table
+db_lock = threading.Lock() #the batches and the connection are shared between the MQTT thread and the flush timer
+flush_timer = None
+
+water_insert = '''
+INSERT INTO water (LabId,SublabId, Water, Timestamp)
+VALUES (?,?,?,?)''' #insert into water table
+fumehood_insert = '''
+INSERT INTO fumehood (LabId,SublabId, Distance, Light, Airflow, Timestamp)
+VALUES (?,?,?,?,?,?)''' #insert into fumehood table
+
+def write_rows_singly(sql, rows):
+    #used after a batch fails, so only the row that caused the error is lost rather than the whole batch
+    for row in rows:
+        try:
+            conn.execute(sql, row)
+            conn.commit()
+        except sqlite3.Error as ex:
+            print("An error occurred in SQLite, row dropped:", row, ex)
+            conn.rollback()
+
+def flush_batches():
+    global flush_timer
+    with db_lock:
+        if flush_timer is not None:
+            flush_timer.cancel()
+            flush_timer = None
+        if not water_batch and not fumehood_batch:
+            return
+        try:
+            if water_batch:
+                conn.executemany(water_insert, water_batch)
+            if fumehood_batch:
+                conn.executemany(fumehood_insert, fumehood_batch)
+            
+            #cursor = conn.execute('SELECT * FROM water')
+            #rows = cursor.fetchall()
+            
+            #column_names = [description[0] for description in cursor.description]
+            #print(f"{column_names}")
+            # Print each row
+            #for row in rows:
+            #    print(row) #view table
+
+            conn.commit() #one commit for the whole batch
+        except sqlite3.Error as ex:
+            print("An error occurred in SQLite, retrying the batch row by row:", ex)
+            conn.rollback() #undo whatever part of the batch went in, so nothing is written twice
+            write_rows_singly(water_insert, water_batch)
+            write_rows_singly(fumehood_insert, fumehood_batch)
+        finally:
+            water_batch.clear() #always emptied, a row that can't be written must not block the ones after it
+            fumehood_batch.clear()
+
+atexit.register(flush_batches) #registered after conn.close, so it runs first and nothing held is lost on exit
+
+def hold_row(batch, row):
+    global flush_timer
+    with db_lock:
+        batch.append(row)
+        full = len(water_batch) + len(fumehood_batch) >= BATCH_SIZE
+        if not full and flush_timer is None:
+            flush_timer = threading.Timer(FLUSH_INTERVAL, flush_batches) #a lone reading is written within FLUSH_INTERVAL even if no other message comes
+            flush_timer.daemon = True
+            flush_timer.start()
+    if full:
+        flush_batches()
 
 def insert_sql_water(labId, sublabId, water, timestamp):
     if water is None:
         water = 0.0 #ensures water isn't null before inserting into table
-    conn = sqlite3.connect('labsense.db',timeout=10) #creates connection to database
-    conn.execute('PRAGMA journal_mode=WAL;')
-    cursor = conn.cursor()
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS water (
-        id INTEGER PRIMARY KEY,
-        LabId INTEGER NOT NULL,
-        SublabId INTEGER NOT NULL,           
-        Water REAL NOT NULL ,
-        Timestamp DATETIME NOT NULL
-    )
-    ''') #creates table
-    
-    cursor.execute('''
-    INSERT INTO water (LabId,SublabId, Water, Timestamp)
-    VALUES (?,?,?,?)''',(labId, sublabId, water,timestamp)) #insert into water table
-    
-    #cursor.execute('SELECT * FROM water')
-    #rows = cursor.fetchall()
-    
-    #column_names = [description[0] for description in cursor.description]
-    #print(f"{column_names}")
-    # Print each row
-    #for row in rows:
-    #    print(row) #view table
-
-    conn.commit()
-    conn.close() #closing the connection
+    hold_row(water_batch, (labId, sublabId, water, timestamp))
 
 def insert_sql_fumehood(labId, sublabId, distance,light,airflow, timestamp):
     if distance is None: #ensures distance isn't null before inserting into table
@@ -45,38 +116,7 @@ def insert_sql_fumehood(labId, sublabId, distance,light,airflow, timestamp):
         light=0.0
     if airflow is None: #ensures airflow isn't null before inserting into table
         airflow=0.0
-
-    conn = sqlite3.connect('labsense.db',timeout=10)
-    conn.execute('PRAGMA journal_mode=WAL;')
-    cursor = conn.cursor()
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS fumehood (
-        id INTEGER PRIMARY KEY,
-        LabId INTEGER NOT NULL,
-        SublabId INTEGER NOT NULL,           
-        Distance REAL NOT NULL ,
-        Light REAL NOT NULL ,
-        Airflow REAL NOT NULL,
-        Timestamp DATETIME NOT NULL
-    )
-    ''')
-    
-    cursor.execute('''
-    INSERT INTO fumehood (LabId,SublabId, Distance, Light, Airflow, Timestamp)
-    VALUES (?,?,?,?,?,?)''',(labId, sublabId, distance,light,airflow,timestamp))
-    
-    cursor.execute('SELECT * FROM fumehood')
-    rows = cursor.fetchall()
-    
-    #column_names = [description[0] for description in cursor.description]
-    #print(f"{column_names}")
-    # Print each row
-    #for row in rows:
-    #    print(row)
-
-    conn.commit()
-    conn.close()
+    hold_row(fumehood_batch, (labId, sublabId, distance, light, airflow, timestamp))
  
 # The callback for when the client receives a CONNACK response from the server.
 def on_connect(client, userdata, flags, rc):
@@ -114,9 +154,13 @@ def on_message(client, userdata, msg):
     except json.JSONDecodeError as e: 
         print(f"Failed to decode JSON message: {e}")
  
+def handle_sigterm(signum, frame):
+    client.disconnect() #makes loop_forever return, so the script exits normally and the atexit flush writes what is held
+
 client = mqtt.Client()
 client.on_connect = on_connect
 client.on_message = on_message
 client.connect(MQTT_SERVER,1883,60) #connects to the mqtt server, on port 1883 and timeout of 60s
+signal.signal(signal.SIGTERM, handle_sigterm)
 client.loop_forever()# use this line if you don't want to write any further code. It blocks the code forever to check for data
 #client.loop_start()  #use this line if you want to write any more 